@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["rapidfuzz"]
+# dependencies = ["rapidfuzz", "numpy", "ijson", "orjson"]
 # ///
 """
 Deduplicate papers from multiple sources using DOI and fuzzy title matching.
@@ -14,33 +14,48 @@ For two-stage lit review (merge multiple directories):
 """
 
 import argparse
-import json
+import math
 import re
 import sys
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
 from pathlib import Path
 
-from rapidfuzz import fuzz
+import ijson
+import numpy as np
+import orjson
+from rapidfuzz import fuzz, process
 
+# Titles scored against their length window per rapidfuzz batch
+BLOCK_SIZE = 1000
 
+NON_WORD_RE = re.compile(r"[^\w\s]")
+# Same replacements as NON_WORD_RE, as a single translate pass for ASCII titles
+ASCII_PUNCTUATION_TABLE = str.maketrans(
+    {chr(c): " " for c in range(128) if NON_WORD_RE.match(chr(c))}
+)
+
+
+@lru_cache(maxsize=None)
 def normalize_title(title: str) -> str:
-    """Normalize title for comparison."""
+    """Normalize title for comparison (cached: sources often repeat titles)."""
     if not title:
         return ""
     # Lowercase, remove extra whitespace, remove punctuation
     title = title.lower()
-    title = re.sub(r"[^\w\s]", " ", title)
-    title = " ".join(title.split())
-    return title
+    if title.isascii():
+        title = title.translate(ASCII_PUNCTUATION_TABLE)
+    else:
+        title = NON_WORD_RE.sub(" ", title)
+    return " ".join(title.split())
 
 
 def get_doi(paper: dict) -> str | None:
     """Extract DOI from paper metadata."""
     # Try various fields where DOI might be stored
-    if paper.get("doi"):
-        return paper["doi"].lower()
-    if paper.get("externalIds") and paper["externalIds"].get("DOI"):
-        return paper["externalIds"]["DOI"].lower()
-    return None
+    doi = paper.get("doi") or (paper.get("externalIds") or {}).get("DOI")
+    return doi.lower() if doi else None
 
 
 def get_title(paper: dict) -> str:
@@ -48,72 +63,132 @@ def get_title(paper: dict) -> str:
     return paper.get("title", "")
 
 
-def deduplicate_papers(papers: list[dict], threshold: float = 0.85) -> list[dict]:
+def find_title_matches(titles: list[str], threshold: float) -> list[list[int]]:
+    """
+    For each normalized title, list the indices of the other titles it matches.
+
+    token_sort_ratio can only reach the threshold when the shorter title is at
+    least threshold / (2 - threshold) times as long as the longer one, so titles
+    are sorted by length and each block is only scored against the window of
+    lengths that could possibly match.
+    """
+    matches: list[list[int]] = [[] for _ in titles]
+    # token_sort_ratio is plain ratio on token-sorted strings, so sort each
+    # title's tokens once here instead of once per compared pair
+    token_sorted = [" ".join(sorted(t.split())) for t in titles]
+    order = sorted(range(len(titles)), key=lambda i: len(token_sorted[i]))
+    by_length = [token_sorted[i] for i in order]
+    lengths = [len(t) for t in by_length]
+    length_ratio = threshold / (2 - threshold)
+
+    for start in range(0, len(by_length), BLOCK_SIZE):
+        block = by_length[start : start + BLOCK_SIZE]
+        lo = bisect_left(lengths, math.floor(len(block[0]) * length_ratio))
+        if length_ratio > 0:
+            hi = bisect_right(lengths, math.ceil(len(block[-1]) / length_ratio))
+        else:
+            hi = len(lengths)
+
+        # Pairs below the cutoff come back as 0.
+        # Token-sorted titles give better matching of reordered words
+        scores = process.cdist(
+            block,
+            by_length[lo:hi],
+            scorer=fuzz.ratio,
+            score_cutoff=threshold * 100,
+            dtype=np.uint8,
+            workers=-1,
+        )
+        for row, col in zip(*np.nonzero(scores)):
+            i = order[start + row]
+            j = order[lo + col]
+            if i != j:
+                matches[i].append(j)
+
+    return matches
+
+
+def deduplicate_papers(papers: Iterable[dict], threshold: float = 0.85) -> list[dict]:
     """
     Deduplicate papers using DOI matching and fuzzy title matching.
 
     Strategy:
-    1. First pass: exact DOI matching
-    2. Second pass: fuzzy title matching for papers without DOI or unmatched DOIs
+    1. First pass: exact DOI matching, consumed as papers stream in so DOI
+       duplicates are never held in memory
+    2. Second pass: fuzzy title matching for papers that survived the DOI pass,
+       scored in batched rapidfuzz calls
     """
     seen_dois: set[str] = set()
-    seen_titles: list[str] = []  # List of normalized titles for fuzzy matching
-    deduplicated: list[dict] = []
-    duplicates_removed = 0
+    survivors: list[dict] = []  # Papers not removed by DOI
+    total = 0
 
     for paper in papers:
+        total += 1
         # Check DOI (exact match)
         doi = get_doi(paper)
         if doi:
             if doi in seen_dois:
-                duplicates_removed += 1
                 continue
             seen_dois.add(doi)
+        survivors.append(paper)
+
+    print(f"Total papers loaded: {total}", file=sys.stderr)
 
-        # Check title (fuzzy match)
-        title = get_title(paper)
+    # Papers without a usable title are never fuzzy-matched
+    titled = []
+    normalized = []
+    for i, paper in enumerate(survivors):
+        title = normalize_title(get_title(paper))
         if title:
-            normalized = normalize_title(title)
-            if normalized:
-                # Check against all seen titles
-                is_duplicate = False
-                for seen_title in seen_titles:
-                    # Use token_sort_ratio for better matching of reordered words
-                    similarity = fuzz.token_sort_ratio(normalized, seen_title) / 100
-                    if similarity >= threshold:
-                        is_duplicate = True
-                        duplicates_removed += 1
-                        break
-
-                if is_duplicate:
-                    continue
+            titled.append(i)
+            normalized.append(title)
+
+    matches = find_title_matches(normalized, threshold)
 
-                seen_titles.append(normalized)
+    # Greedy pass in input order: keep a title unless it matches a kept one
+    kept = [False] * len(titled)
+    title_duplicates: set[int] = set()
+    for row, i in enumerate(titled):
+        if any(kept[other] for other in matches[row]):
+            title_duplicates.add(i)
+        else:
+            kept[row] = True
 
-        deduplicated.append(paper)
+    deduplicated = [
+        paper for i, paper in enumerate(survivors) if i not in title_duplicates
+    ]
 
+    duplicates_removed = total - len(deduplicated)
     print(f"  Removed {duplicates_removed} duplicates", file=sys.stderr)
     return deduplicated
 
 
-def load_results_from_dir(input_dir: Path) -> list[dict]:
-    """Load all JSON result files from a directory."""
-    all_papers = []
-
+def load_results_from_dir(input_dir: Path) -> Iterator[dict]:
+    """Stream papers from all JSON result files in a directory."""
     for json_file in input_dir.glob("*.json"):
         print(f"  Loading: {json_file.name}", file=sys.stderr)
         try:
-            with open(json_file) as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    all_papers.extend(data)
-                    print(f"    Found {len(data)} papers", file=sys.stderr)
-                else:
+            with open(json_file, "rb") as f:
+                _, first_event, _ = next(ijson.parse(f))
+                if first_event != "start_array":
                     print(f"    Skipped (not a list)", file=sys.stderr)
+                    continue
+                f.seek(0)
+
+                count = 0
+                for paper in ijson.items(f, "item", use_float=True):
+                    count += 1
+                    yield paper
+                print(f"    Found {count} papers", file=sys.stderr)
         except Exception as e:
             print(f"    Error loading: {e}", file=sys.stderr)
 
-    return all_papers
+
+def load_results(input_dirs: list[Path]) -> Iterator[dict]:
+    """Stream papers from every input directory in order."""
+    for input_dir in input_dirs:
+        print(f"From {input_dir}:", file=sys.stderr)
+        yield from load_results_from_dir(input_dir)
 
 
 def main():
@@ -145,18 +220,9 @@ def main():
             print(f"Error: Input directory does not exist: {input_dir}", file=sys.stderr)
             sys.exit(1)
 
-    # Load all results from all directories
-    print("Loading results...", file=sys.stderr)
-    all_papers = []
-    for input_dir in args.input_dirs:
-        print(f"From {input_dir}:", file=sys.stderr)
-        papers = load_results_from_dir(input_dir)
-        all_papers.extend(papers)
-    print(f"Total papers loaded: {len(all_papers)}", file=sys.stderr)
-
-    # Deduplicate
-    print(f"Deduplicating with threshold {args.threshold}...", file=sys.stderr)
-    deduplicated = deduplicate_papers(all_papers, args.threshold)
+    # Load and deduplicate, streaming papers from all directories
+    print(f"Loading results (threshold {args.threshold})...", file=sys.stderr)
+    deduplicated = deduplicate_papers(load_results(args.input_dirs), args.threshold)
 
     # Count by source
     sources = {}
@@ -171,8 +237,8 @@ def main():
 
     # Save output
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(deduplicated, f, indent=2)
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(deduplicated, option=orjson.OPT_INDENT_2))
 
     print("", file=sys.stderr)
     print(f"Saved {len(deduplicated)} unique papers to {args.output}", file=sys.stderr)
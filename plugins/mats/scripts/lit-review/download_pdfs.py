@@ -1,34 +1,56 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["httpx", "aiofiles"]
+# dependencies = ["httpx[http2]", "aiofiles", "ijson", "orjson", "uvloop; sys_platform != 'win32'"]
 # ///
 """
 Download PDFs from paper metadata.
 
 Usage:
-    uv run download_pdfs.py --input deduplicated.json --output-dir papers/ [--max-concurrent 5]
+    uv run download_pdfs.py --input deduplicated.json --output-dir papers/ [--max-concurrent 5] [--max-total 20]
 """
 
 import argparse
 import asyncio
-import json
 import re
 import sys
+from dataclasses import dataclass
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import aiofiles
 import httpx
+import ijson
+import orjson
 
-MAX_CONCURRENT_DOWNLOADS = 5
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
+MAX_CONCURRENT_DOWNLOADS = 5  # Per host
+MAX_TOTAL_DOWNLOADS = 20
 MAX_RETRIES = 5
 TIMEOUT_SECONDS = 120
+CHUNK_SIZE = 64 * 1024
+
+FILENAME_DELETE_TABLE = str.maketrans("", "", '<>:"/\\|?*')
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass(slots=True)
+class Candidate:
+    """The parts of a paper record needed to download its PDF."""
+
+    paper_id: str
+    pdf_url: str | None
+    title: str | None
 
 
 def sanitize_filename(name: str) -> str:
     """Create a safe filename from a string."""
     # Remove or replace problematic characters
-    name = re.sub(r'[<>:"/\\|?*]', "", name)
-    name = re.sub(r"\s+", "_", name)
+    name = name.translate(FILENAME_DELETE_TABLE)
+    name = WHITESPACE_RE.sub("_", name)
     name = name[:100]  # Limit length
     return name
 
@@ -64,37 +86,65 @@ def get_pdf_url(paper: dict) -> str | None:
     return None
 
 
+def load_candidates(input_path: Path) -> list[Candidate] | None:
+    """
+    Stream papers from a JSON array, keeping only what downloading needs.
+
+    Returns None if the file does not contain a JSON array.
+    """
+    with open(input_path, "rb") as f:
+        _, first_event, _ = next(ijson.parse(f))
+        if first_event != "start_array":
+            return None
+        f.seek(0)
+
+        return [
+            Candidate(get_paper_id(paper), get_pdf_url(paper), paper.get("title"))
+            for paper in ijson.items(f, "item", use_float=True)
+        ]
+
+
 async def download_pdf(
     client: httpx.AsyncClient,
     url: str,
     output_path: Path,
     paper_id: str,
 ) -> bool:
-    """Download a single PDF with retry logic."""
+    """Download a single PDF with retry logic, streaming it to disk."""
+    # Write to a temporary file so an interrupted download never looks like
+    # a finished one to the exists() check on the next run; every failed exit
+    # removes it, since an earlier attempt may have written part of the body
+    partial_path = output_path.with_name(f"{output_path.name}.part")
+
     for attempt in range(MAX_RETRIES):
         try:
-            resp = await client.get(
+            async with client.stream(
+                "GET",
                 url,
                 follow_redirects=True,
                 timeout=TIMEOUT_SECONDS,
-            )
-            resp.raise_for_status()
-
-            # Check if we got a PDF
-            content_type = resp.headers.get("content-type", "")
-            if "pdf" not in content_type.lower() and not url.endswith(".pdf"):
-                # Might be HTML (paywall, etc.)
-                if "html" in content_type.lower():
-                    return False
-
-            async with aiofiles.open(output_path, "wb") as f:
-                await f.write(resp.content)
-
+            ) as resp:
+                resp.raise_for_status()
+
+                # Check if we got a PDF
+                content_type = resp.headers.get("content-type", "")
+                if "pdf" not in content_type.lower() and not url.endswith(".pdf"):
+                    # Might be HTML (paywall, etc.)
+                    if "html" in content_type.lower():
+                        partial_path.unlink(missing_ok=True)
+                        return False
+
+                async with aiofiles.open(partial_path, "wb") as f:
+                    async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                        await f.write(chunk)
+
+            partial_path.replace(output_path)
             return True
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code in (403, 404, 451):
                 # Permanent failures
+                partial_path.unlink(missing_ok=True)
                 return False
             if attempt < MAX_RETRIES - 1:
                 await asyncio.sleep(2**attempt)
@@ -104,17 +154,21 @@ async def download_pdf(
             else:
                 print(f"    Failed to download {paper_id}: {e}", file=sys.stderr)
 
+    partial_path.unlink(missing_ok=True)
     return False
 
 
 async def download_all(
-    papers: list[dict],
+    papers: list[Candidate],
     output_dir: Path,
     max_concurrent: int = MAX_CONCURRENT_DOWNLOADS,
+    max_total: int = MAX_TOTAL_DOWNLOADS,
 ) -> dict:
-    """Download PDFs for all papers with rate limiting."""
+    """Download PDFs for all papers with per-host and overall rate limiting."""
     output_dir.mkdir(parents=True, exist_ok=True)
-    semaphore = asyncio.Semaphore(max_concurrent)
+    # Each host gets its own limit so one slow publisher doesn't stall the rest
+    host_semaphores: dict[str, asyncio.Semaphore] = {}
+    total_semaphore = asyncio.Semaphore(max_total)
 
     stats = {
         "total": len(papers),
@@ -126,9 +180,11 @@ async def download_all(
         "failed_papers": [],
     }
 
-    async def download_with_semaphore(paper: dict) -> None:
-        paper_id = get_paper_id(paper)
-        pdf_url = get_pdf_url(paper)
+    async def download_with_semaphore(
+        client: httpx.AsyncClient, paper: Candidate
+    ) -> None:
+        paper_id = paper.paper_id
+        pdf_url = paper.pdf_url
 
         if not pdf_url:
             stats["skipped_no_url"] += 1
@@ -141,9 +197,14 @@ async def download_all(
             stats["downloaded_files"].append(str(output_path))
             return
 
-        async with semaphore:
-            async with httpx.AsyncClient() as client:
-                success = await download_pdf(client, pdf_url, output_path, paper_id)
+        host = urlsplit(pdf_url).netloc
+        if host not in host_semaphores:
+            host_semaphores[host] = asyncio.Semaphore(max_concurrent)
+
+        # Wait for the host slot first so tasks queued behind a slow host
+        # don't hold overall slots
+        async with host_semaphores[host], total_semaphore:
+            success = await download_pdf(client, pdf_url, output_path, paper_id)
 
             if success:
                 stats["downloaded"] += 1
@@ -152,14 +213,22 @@ async def download_all(
             else:
                 stats["failed"] += 1
                 stats["failed_papers"].append(
-                    {"id": paper_id, "title": paper.get("title"), "url": pdf_url}
+                    {"id": paper_id, "title": paper.title, "url": pdf_url}
                 )
 
-    # Create tasks for all papers
-    tasks = [download_with_semaphore(paper) for paper in papers]
+    # One pooled client so downloads from the same host reuse connections
+    limits = httpx.Limits(
+        max_connections=max_total,
+        max_keepalive_connections=max_total,
+    )
+    async with httpx.AsyncClient(
+        http2=True, limits=limits, timeout=TIMEOUT_SECONDS
+    ) as client:
+        # Create tasks for all papers
+        tasks = [download_with_semaphore(client, paper) for paper in papers]
 
-    print(f"Downloading PDFs for {len(papers)} papers...", file=sys.stderr)
-    await asyncio.gather(*tasks)
+        print(f"Downloading PDFs for {len(papers)} papers...", file=sys.stderr)
+        await asyncio.gather(*tasks)
 
     return stats
 
@@ -179,20 +248,28 @@ def main():
         "--max-concurrent",
         type=int,
         default=MAX_CONCURRENT_DOWNLOADS,
-        help="Max concurrent downloads",
+        help="Max concurrent downloads per host",
+    )
+    parser.add_argument(
+        "--max-total",
+        type=int,
+        default=MAX_TOTAL_DOWNLOADS,
+        help="Max concurrent downloads across all hosts",
     )
     args = parser.parse_args()
 
     # Load papers
-    with open(args.input) as f:
-        papers = json.load(f)
+    papers = load_candidates(args.input)
 
-    if not isinstance(papers, list):
+    if papers is None:
         print("Error: input file must contain a JSON array of papers", file=sys.stderr)
         sys.exit(1)
 
-    # Download PDFs
-    stats = asyncio.run(download_all(papers, args.output_dir, args.max_concurrent))
+    # Download PDFs (uvloop's event loop when available)
+    run = uvloop.run if uvloop else asyncio.run
+    stats = run(
+        download_all(papers, args.output_dir, args.max_concurrent, args.max_total)
+    )
 
     # Print summary
     print("", file=sys.stderr)
@@ -205,8 +282,8 @@ def main():
 
     # Save stats
     stats_path = args.output_dir / "download_stats.json"
-    with open(stats_path, "w") as f:
-        json.dump(stats, f, indent=2)
+    with open(stats_path, "wb") as f:
+        f.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
     print(f"  Stats saved to: {stats_path}", file=sys.stderr)
 
 
@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["httpx"]
+# dependencies = ["httpx[http2]", "aiofiles", "aiolimiter", "orjson", "uvloop; sys_platform != 'win32'"]
 # ///
 """
 Fetch full content from LessWrong/Alignment Forum URLs via GraphQL API.
@@ -14,15 +14,34 @@ Usage:
 
 import argparse
 import asyncio
-import json
+import math
 import re
 import sys
+from collections import deque
 from pathlib import Path
 
+import aiofiles
 import httpx
+import orjson
+from aiolimiter import AsyncLimiter
+
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
+MAX_CONCURRENT_FETCHES = 4
+REQUESTS_PER_SECOND = 3  # Per GraphQL endpoint
 
 LESSWRONG_GRAPHQL = "https://www.lesswrong.com/graphql"
 EA_FORUM_GRAPHQL = "https://forum-bots.effectivealtruism.org/graphql"
+# Request bodies are serialized with orjson and sent as raw content
+GRAPHQL_HEADERS = {"Content-Type": "application/json"}
+
+# URL format: /posts/{post_id}/{slug}
+POST_URL_RE = re.compile(r"/posts/([^/]+)/([^/?#]+)")
+# Simpler format: /posts/{post_id}
+POST_ID_URL_RE = re.compile(r"/posts/([^/?#]+)")
 
 POST_BY_SLUG_QUERY = """
 query GetPostBySlug($slug: String!) {
@@ -112,69 +131,110 @@ def extract_post_info_from_url(url: str) -> tuple[str | None, str | None, str]:
     else:
         return None, None, ""
 
-    # URL format: /posts/{post_id}/{slug}
-    match = re.search(r'/posts/([^/]+)/([^/?#]+)', url)
+    if "/posts/" not in url:
+        return None, None, source
+
+    match = POST_URL_RE.search(url)
     if match:
         return match.group(1), match.group(2), source
 
-    # Simpler format: /posts/{post_id}
-    match = re.search(r'/posts/([^/?#]+)', url)
+    match = POST_ID_URL_RE.search(url)
     if match:
         return match.group(1), None, source
 
     return None, None, source
 
 
+def reshape_comment(comment: dict) -> dict:
+    """Rename a GraphQL comment's fields to the output schema, in place."""
+    contents = comment.pop("contents", None)
+    user = comment.pop("user", None) or {}
+    comment.pop("postId", None)
+
+    comment["comment_id"] = comment.pop("_id", None)
+    comment["parent_comment_id"] = comment.pop("parentCommentId", None)
+    comment["html_content"] = contents.get("html") if contents else None
+    comment["score"] = comment.pop("baseScore", None)
+    comment["posted_at"] = comment.pop("postedAt", None)
+    comment["author"] = user.get("displayName") or user.get("username")
+    return comment
+
+
 async def fetch_comments(
-    client: httpx.AsyncClient, graphql_url: str, post_id: str, max_comments: int = 500
+    client: httpx.AsyncClient,
+    limiter: AsyncLimiter,
+    graphql_url: str,
+    post_id: str,
+    comment_count: int,
+    max_comments: int = 500,
 ) -> list[dict]:
-    """Fetch all comments for a post with pagination."""
-    comments = []
-    offset = 0
+    """Fetch all comments for a post, requesting the known pages concurrently."""
     batch_size = 100
 
-    while len(comments) < max_comments:
+    async def fetch_batch(offset: int) -> list[dict] | None:
         for attempt in range(3):
             try:
-                resp = await client.post(
-                    graphql_url,
-                    json={
-                        "query": COMMENTS_QUERY,
-                        "variables": {
-                            "postId": post_id,
-                            "limit": batch_size,
-                            "offset": offset,
-                        },
-                    },
-                    timeout=30.0,
-                )
+                async with limiter:
+                    resp = await client.post(
+                        graphql_url,
+                        content=orjson.dumps(
+                            {
+                                "query": COMMENTS_QUERY,
+                                "variables": {
+                                    "postId": post_id,
+                                    "limit": batch_size,
+                                    "offset": offset,
+                                },
+                            }
+                        ),
+                        headers=GRAPHQL_HEADERS,
+                        timeout=30.0,
+                    )
                 resp.raise_for_status()
-                data = resp.json()
+                data = orjson.loads(resp.content)
 
                 if "errors" in data:
-                    return comments
-
-                batch = data.get("data", {}).get("comments", {}).get("results", [])
-                comments.extend(batch)
+                    return None
 
-                if len(batch) < batch_size:
-                    return comments
-                offset += batch_size
-                break
+                return data.get("data", {}).get("comments", {}).get("results", [])
             except Exception as e:
                 if attempt == 2:
-                    return comments
+                    return None
                 await asyncio.sleep(2**attempt)
+        return None
+
+    comments = []
+    offset = 0
+
+    while len(comments) < max_comments:
+        # commentCount can be stale, so keep paging past it until a short batch
+        remaining = max(comment_count - offset, batch_size)
+        pages = math.ceil(min(max_comments - len(comments), remaining) / batch_size)
+        batches = await asyncio.gather(
+            *(fetch_batch(offset + page * batch_size) for page in range(pages))
+        )
+
+        # Keep everything up to the first failed or short batch
+        for batch in batches:
+            if batch is None:
+                return comments
+            comments.extend(batch)
+            if len(batch) < batch_size:
+                return comments
+        offset += pages * batch_size
 
     return comments
 
 
 async def fetch_post(
-    client: httpx.AsyncClient, source: str, post_id: str | None, slug: str | None
+    client: httpx.AsyncClient,
+    limiter: AsyncLimiter,
+    graphql_url: str,
+    source: str,
+    post_id: str | None,
+    slug: str | None,
 ) -> dict | None:
     """Fetch full post content by ID or slug."""
-    graphql_url = LESSWRONG_GRAPHQL if source == "lesswrong" else EA_FORUM_GRAPHQL
-
     try:
         # LessWrong supports slug, EA Forum requires _id
         if source == "lesswrong" and slug:
@@ -186,13 +246,15 @@ async def fetch_post(
         else:
             return None
 
-        resp = await client.post(
-            graphql_url,
-            json={"query": query, "variables": variables},
-            timeout=30.0,
-        )
+        async with limiter:
+            resp = await client.post(
+                graphql_url,
+                content=orjson.dumps({"query": query, "variables": variables}),
+                headers=GRAPHQL_HEADERS,
+                timeout=30.0,
+            )
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
 
         if "errors" in data:
             return None
@@ -204,38 +266,66 @@ async def fetch_post(
         return None
 
 
-async def fetch_all_posts(urls: list[dict]) -> list[dict]:
-    """Fetch full content for all URLs."""
-    results = []
+def dedupe_urls(urls: list) -> list:
+    """Drop repeated URLs in one pass, keeping the first entry for each."""
+    unique = {}
+    for url_info in urls:
+        url = url_info.get("url") if isinstance(url_info, dict) else url_info
+        if not isinstance(url, str):
+            print(f"  Skipping - entry without a URL: {url_info}", file=sys.stderr)
+            continue
+        unique.setdefault(url, url_info)
+    return list(unique.values())
+
+
+async def fetch_all_posts(
+    urls: list[dict], output_path: Path, max_concurrent: int = MAX_CONCURRENT_FETCHES
+) -> int:
+    """
+    Fetch full content for all URLs concurrently, writing posts to output_path.
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        for i, url_info in enumerate(urls):
-            url = url_info.get("url", url_info) if isinstance(url_info, dict) else url_info
-            title = url_info.get("title", "") if isinstance(url_info, dict) else ""
+    Posts are written as a JSON array in input order, each as soon as it and
+    the posts before it are done. Returns the number of posts written.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    # Token bucket per endpoint keeps requests polite without idling workers
+    limiters = {
+        LESSWRONG_GRAPHQL: AsyncLimiter(REQUESTS_PER_SECOND, 1),
+        EA_FORUM_GRAPHQL: AsyncLimiter(REQUESTS_PER_SECOND, 1),
+    }
 
-            print(f"Fetching ({i+1}/{len(urls)}): {title[:50] or url[:50]}...", file=sys.stderr)
+    async def fetch_one(client: httpx.AsyncClient, i: int, url_info) -> dict | None:
+        url = url_info.get("url", url_info) if isinstance(url_info, dict) else url_info
+        title = url_info.get("title", "") if isinstance(url_info, dict) else ""
+        label = title[:50] or url[:50]
 
-            post_id, slug, source = extract_post_info_from_url(url)
-            if not post_id and not slug:
-                print(f"  Skipping - not a valid LW/AF post URL", file=sys.stderr)
-                continue
+        post_id, slug, source = extract_post_info_from_url(url)
+        if not post_id and not slug:
+            print(f"  Skipping - not a valid LW/AF post URL: {label}", file=sys.stderr)
+            return None
 
-            post = await fetch_post(client, source, post_id, slug)
-            if not post:
-                print(f"  Failed to fetch post", file=sys.stderr)
-                continue
+        # Determine GraphQL URL for the post and its comments
+        graphql_url = LESSWRONG_GRAPHQL if source == "lesswrong" else EA_FORUM_GRAPHQL
+        limiter = limiters[graphql_url]
 
-            # Determine GraphQL URL for comments
-            graphql_url = LESSWRONG_GRAPHQL if source == "lesswrong" else EA_FORUM_GRAPHQL
+        async with semaphore:
+            print(f"Fetching ({i+1}/{len(urls)}): {label}...", file=sys.stderr)
+
+            post = await fetch_post(client, limiter, graphql_url, source, post_id, slug)
+            if not post:
+                print(f"  Failed to fetch post: {label}", file=sys.stderr)
+                return None
 
             # Fetch comments
             comments = []
-            comment_count = post.get("commentCount", 0)
+            comment_count = post.get("commentCount") or 0
             if comment_count > 0:
-                print(f"  Fetching {comment_count} comments...", file=sys.stderr)
-                comments = await fetch_comments(client, graphql_url, post["_id"])
+                print(f"  Fetching {comment_count} comments for: {label}", file=sys.stderr)
+                comments = await fetch_comments(
+                    client, limiter, graphql_url, post["_id"], comment_count
+                )
 
-            results.append({
+            return {
                 "source": source,
                 "post_id": post.get("_id"),
                 "title": post.get("title"),
@@ -249,24 +339,49 @@ async def fetch_all_posts(urls: list[dict]) -> list[dict]:
                 "author": (post.get("user", {}) or {}).get("displayName")
                     or (post.get("user", {}) or {}).get("username"),
                 "tags": [t.get("name") for t in post.get("tags", []) if t],
-                "comments": [
-                    {
-                        "comment_id": c.get("_id"),
-                        "parent_comment_id": c.get("parentCommentId"),
-                        "html_content": c.get("contents", {}).get("html") if c.get("contents") else None,
-                        "score": c.get("baseScore"),
-                        "posted_at": c.get("postedAt"),
-                        "author": (c.get("user", {}) or {}).get("displayName")
-                            or (c.get("user", {}) or {}).get("username"),
-                    }
-                    for c in comments
-                ],
-            })
-
-            # Small delay between requests
-            await asyncio.sleep(0.3)
-
-    return results
+                "comments": [reshape_comment(c) for c in comments],
+            }
+
+    # All traffic goes to two GraphQL hosts; HTTP/2 multiplexes the concurrent
+    # post and comment requests over one connection per host
+    limits = httpx.Limits(
+        max_keepalive_connections=20,
+        max_connections=100,
+        keepalive_expiry=30,
+    )
+    async with httpx.AsyncClient(
+        http2=True, limits=limits, follow_redirects=True
+    ) as client:
+        pending = deque(
+            asyncio.create_task(fetch_one(client, i, url_info))
+            for i, url_info in enumerate(urls)
+        )
+
+        # Popping each task as it is written drops the post from memory
+        # instead of holding every result until the end. Posts go to a
+        # temporary file so a failed run never replaces a previous good output
+        partial_path = output_path.with_name(f"{output_path.name}.part")
+        count = 0
+        try:
+            async with aiofiles.open(partial_path, "wb") as f:
+                await f.write(b"[")
+                while pending:
+                    result = await pending.popleft()
+                    if not result:
+                        continue
+                    await f.write(b",\n" if count else b"\n")
+                    await f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+                    count += 1
+                await f.write(b"\n]" if count else b"]")
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            partial_path.unlink(missing_ok=True)
+            raise
+
+    partial_path.replace(output_path)
+    return count
 
 
 def main():
@@ -282,27 +397,34 @@ def main():
     parser.add_argument(
         "--output", type=Path, required=True, help="Output JSON file for results"
     )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=MAX_CONCURRENT_FETCHES,
+        help="Max posts fetched concurrently",
+    )
     args = parser.parse_args()
 
     # Load URLs
-    with open(args.urls) as f:
-        urls = json.load(f)
+    with open(args.urls, "rb") as f:
+        urls = orjson.loads(f.read())
 
     if not isinstance(urls, list):
         print("Error: urls file must contain a JSON array", file=sys.stderr)
         sys.exit(1)
 
-    print(f"Fetching content for {len(urls)} URLs...", file=sys.stderr)
+    # Search results often repeat a post; fetch each URL once
+    urls = dedupe_urls(urls)
 
-    # Fetch all posts
-    results = asyncio.run(fetch_all_posts(urls))
+    print(f"Fetching content for {len(urls)} URLs...", file=sys.stderr)
 
-    # Save results
+    # Fetch all posts, saving each as it completes (uvloop's event loop when
+    # available)
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(results, f, indent=2)
+    run = uvloop.run if uvloop else asyncio.run
+    count = run(fetch_all_posts(urls, args.output, args.max_concurrent))
 
-    print(f"\nSaved {len(results)} results to {args.output}", file=sys.stderr)
+    print(f"\nSaved {count} results to {args.output}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = []
+# dependencies = ["ijson"]
 # ///
 """
 Generate catalog.md from paper summaries.
@@ -10,16 +10,27 @@ Usage:
 """
 
 import argparse
-import json
+import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import ijson
+
+# "Score: N" or "Score: N/10"
+SCORE_RE = re.compile(r"Score:\s*(\d+)(?:/10)?")
+# First # heading
+TITLE_RE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+# ## Summary section
+SUMMARY_RE = re.compile(r"##\s+Summary\s*\n+(.+?)(?=\n##|\Z)", re.DOTALL)
+
+MAX_READ_WORKERS = 8
+
 
 def extract_relevance_score(summary_content: str) -> int | None:
     """Extract relevance score from summary content."""
-    # Look for "Score: N" or "Score: N/10" pattern
-    match = re.search(r"Score:\s*(\d+)(?:/10)?", summary_content)
+    match = SCORE_RE.search(summary_content)
     if match:
         return int(match.group(1))
     return None
@@ -27,7 +38,7 @@ def extract_relevance_score(summary_content: str) -> int | None:
 
 def extract_title_from_summary(summary_content: str) -> str | None:
     """Extract title from summary content (first # heading)."""
-    match = re.search(r"^#\s+(.+)$", summary_content, re.MULTILINE)
+    match = TITLE_RE.search(summary_content)
     if match:
         return match.group(1).strip()
     return None
@@ -35,58 +46,68 @@ def extract_title_from_summary(summary_content: str) -> str | None:
 
 def extract_short_summary(summary_content: str) -> str | None:
     """Extract the summary section from the content."""
-    # Look for ## Summary section
-    match = re.search(
-        r"##\s+Summary\s*\n+(.+?)(?=\n##|\Z)", summary_content, re.DOTALL
-    )
+    match = SUMMARY_RE.search(summary_content)
     if match:
         return match.group(1).strip()[:300]  # Limit length
     return None
 
 
+def load_summary(entry: os.DirEntry) -> tuple[str, dict | None]:
+    """Read one summary file and extract its metadata (None on error)."""
+    paper_id = entry.name[:-3]
+    try:
+        # Text mode keeps the universal newline handling of read_text
+        with open(entry.path, encoding="utf-8") as f:
+            content = f.read()
+    except Exception as e:
+        print(f"  Error loading {entry.name}: {e}", file=sys.stderr)
+        return paper_id, None
+
+    return paper_id, {
+        "file": entry.path,
+        "title": extract_title_from_summary(content),
+        "relevance_score": extract_relevance_score(content),
+        "short_summary": extract_short_summary(content),
+        "content": content,
+    }
+
+
 def load_summaries(summaries_dir: Path) -> dict[str, dict]:
     """Load all summary files and extract metadata."""
     summaries = {}
 
-    for md_file in summaries_dir.glob("*.md"):
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            paper_id = md_file.stem
-
-            summaries[paper_id] = {
-                "file": str(md_file),
-                "title": extract_title_from_summary(content),
-                "relevance_score": extract_relevance_score(content),
-                "short_summary": extract_short_summary(content),
-                "content": content,
-            }
-        except Exception as e:
-            print(f"  Error loading {md_file.name}: {e}", file=sys.stderr)
+    # scandir yields plain names and paths without building a Path per file
+    with os.scandir(summaries_dir) as it:
+        entries = [e for e in it if e.name.endswith(".md") and e.is_file()]
+
+    # Threads overlap the file reads; map keeps directory order
+    with ThreadPoolExecutor(max_workers=MAX_READ_WORKERS) as executor:
+        for paper_id, summary in executor.map(load_summary, entries):
+            if summary is not None:
+                summaries[paper_id] = summary
 
     return summaries
 
 
 def load_papers(papers_file: Path) -> dict[str, dict]:
     """Load paper metadata keyed by sanitized ID."""
-    with open(papers_file) as f:
-        papers = json.load(f)
-
-    # Create lookup by various IDs
+    # Create lookup by various IDs, streaming papers instead of loading them all
     lookup = {}
-    for paper in papers:
-        # Try to match how download_pdfs.py generates IDs
-        if paper.get("doi"):
-            key = paper["doi"].replace("/", "_")
-            lookup[key] = paper
-        if paper.get("arxiv_id"):
-            arxiv_id = paper["arxiv_id"]
-            if "arxiv.org" in arxiv_id:
-                arxiv_id = arxiv_id.split("/")[-1]
-            lookup[f"arxiv_{arxiv_id}"] = paper
-        if paper.get("post_id"):
-            lookup[f"lw_{paper['post_id']}"] = paper
-        if paper.get("paperId"):
-            lookup[f"s2_{paper['paperId']}"] = paper
+    with open(papers_file, "rb") as f:
+        for paper in ijson.items(f, "item", use_float=True):
+            # Try to match how download_pdfs.py generates IDs
+            if paper.get("doi"):
+                key = paper["doi"].replace("/", "_")
+                lookup[key] = paper
+            if paper.get("arxiv_id"):
+                arxiv_id = paper["arxiv_id"]
+                if "arxiv.org" in arxiv_id:
+                    arxiv_id = arxiv_id.split("/")[-1]
+                lookup[f"arxiv_{arxiv_id}"] = paper
+            if paper.get("post_id"):
+                lookup[f"lw_{paper['post_id']}"] = paper
+            if paper.get("paperId"):
+                lookup[f"s2_{paper['paperId']}"] = paper
 
     return lookup
 
@@ -102,56 +123,55 @@ def generate_catalog(
         reverse=True,
     )
 
-    lines = [
-        "# Literature Review Catalog",
-        "",
-        f"Total papers: {len(summaries)}",
-        "",
-        "---",
-        "",
-    ]
-
-    for i, (paper_id, summary) in enumerate(sorted_items, 1):
-        title = summary.get("title") or paper_id
-        score = summary.get("relevance_score")
-        short_summary = summary.get("short_summary") or "No summary available."
-
-        # Get additional metadata from papers if available
-        paper = papers.get(paper_id, {})
-        source = paper.get("source", "unknown")
-        authors = paper.get("authors", [])
-        year = paper.get("year")
-        url = paper.get("url") or paper.get("pdf_url") or paper.get("pageUrl")
-
-        # Format authors
-        if isinstance(authors, list):
-            if len(authors) > 3:
-                authors_str = ", ".join(str(a) for a in authors[:3]) + " et al."
+    with output_path.open("w", encoding="utf-8") as out:
+        out.write(f"# Literature Review Catalog\n\nTotal papers: {len(summaries)}\n\n---\n")
+
+        for i, (paper_id, summary) in enumerate(sorted_items, 1):
+            title = summary.get("title") or paper_id
+            score = summary.get("relevance_score")
+            short_summary = summary.get("short_summary") or "No summary available."
+
+            # Get additional metadata from papers if available
+            paper = papers.get(paper_id, {})
+            source = paper.get("source", "unknown")
+            authors = paper.get("authors", [])
+            year = paper.get("year")
+            url = paper.get("url") or paper.get("pdf_url") or paper.get("pageUrl")
+
+            # Format authors
+            if isinstance(authors, list):
+                shown = authors[:3]
+                try:
+                    # Authors are almost always plain strings already
+                    authors_str = ", ".join(shown)
+                except TypeError:
+                    authors_str = ", ".join(map(str, shown))
+                if len(authors) > 3:
+                    authors_str += " et al."
             else:
-                authors_str = ", ".join(str(a) for a in authors)
-        else:
-            authors_str = str(authors) if authors else "Unknown"
-
-        lines.append(f"## {i}. {title}")
-        lines.append("")
-        if score is not None:
-            lines.append(f"**Relevance Score:** {score}/10")
-        lines.append(f"**Source:** {source}")
-        if year:
-            lines.append(f"**Year:** {year}")
-        if authors_str:
-            lines.append(f"**Authors:** {authors_str}")
-        if url:
-            lines.append(f"**URL:** {url}")
-        lines.append("")
-        lines.append(short_summary)
-        lines.append("")
-        lines.append(f"*Full summary: [{paper_id}.md](summaries/{paper_id}.md)*")
-        lines.append("")
-        lines.append("---")
-        lines.append("")
-
-    output_path.write_text("\n".join(lines), encoding="utf-8")
+                authors_str = str(authors) if authors else "Unknown"
+
+            meta = []
+            if score is not None:
+                meta.append(f"**Relevance Score:** {score}/10")
+            meta.append(f"**Source:** {source}")
+            if year:
+                meta.append(f"**Year:** {year}")
+            if authors_str:
+                meta.append(f"**Authors:** {authors_str}")
+            if url:
+                meta.append(f"**URL:** {url}")
+            meta_str = "\n".join(meta)
+
+            # Write each entry as it is formatted rather than building the
+            # whole catalog in memory
+            out.write(
+                f"\n## {i}. {title}\n\n"
+                f"{meta_str}\n\n"
+                f"{short_summary}\n\n"
+                f"*Full summary: [{paper_id}.md](summaries/{paper_id}.md)*\n\n"
+                "---\n"
+            )
 
 
 def main():
@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["markdownify>=0.13.1"]
+# dependencies = ["markdownify>=0.13.1", "ijson"]
 # ///
 """
 Convert HTML content from LessWrong/Alignment Forum posts to markdown.
@@ -10,36 +10,83 @@ and writes markdown files to the output directory.
 """
 
 import argparse
-import json
 import re
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+import ijson
 from markdownify import markdownify as md
 
+NON_SLUG_RE = re.compile(r'[^\w\s-]')
+SLUG_SEPARATOR_RE = re.compile(r'[-\s]+')
+
+LW_SOURCES = frozenset({"lesswrong", "alignment_forum", "alignmentforum"})
+
+# Marks the end of each comment in the batched conversion; random so it can't
+# collide with comment text, and alphanumeric so markdownify leaves it alone
+COMMENT_SEPARATOR = f'commentend{uuid.uuid4().hex}'
+COMMENT_SEPARATOR_RE = re.compile(rf'^{COMMENT_SEPARATOR}$', re.MULTILINE)
+
 
 def slugify(text: str) -> str:
     """Convert text to a safe filename."""
     text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text).strip('-')
+    text = NON_SLUG_RE.sub('', text)
+    text = SLUG_SEPARATOR_RE.sub('-', text).strip('-')
     return text[:80]
 
 
-def format_comment(comment: dict, indent_level: int = 0) -> str:
-    """Format a comment and its replies recursively."""
+def convert_comments_html(comments: list[dict]) -> dict[int, str]:
+    """
+    Convert the HTML bodies of a comment tree to markdown in one markdownify call.
+
+    Returns the markdown, stripped of surrounding whitespace, keyed by id() of
+    each comment whose content is HTML.
+    """
+    html_comments = []
+
+    def collect(comments: list[dict]) -> None:
+        for comment in comments:
+            content = comment.get("html_content") or comment.get("content", "")
+            if content.startswith("<"):
+                html_comments.append((id(comment), content))
+            collect(comment.get("replies", []))
+
+    collect(comments)
+    if not html_comments:
+        return {}
+
+    # One parse per post instead of one per comment; each body is wrapped so
+    # stray unclosed tags end at its own separator
+    batch = "".join(
+        f"<div>{content}</div><p>{COMMENT_SEPARATOR}</p>" for _, content in html_comments
+    )
+    parts = COMMENT_SEPARATOR_RE.split(md(batch, strip=['script', 'style']))
+
+    if len(parts) != len(html_comments) + 1:
+        # Markup swallowed a separator; convert comments one at a time instead
+        return {
+            key: md(content, strip=['script', 'style']).strip()
+            for key, content in html_comments
+        }
+    return {key: part.strip() for (key, _), part in zip(html_comments, parts)}
+
+
+def format_comment(
+    comment: dict, converted: dict[int, str], indent_level: int = 0
+) -> str:
+    """Format a comment and its replies recursively, using pre-converted HTML."""
     prefix = "#" * (3 + indent_level)
     author = comment.get("author", "Anonymous")
     score = comment.get("score", "?")
     content = comment.get("html_content") or comment.get("content", "")
-
-    if content.startswith("<"):
-        content = md(content, strip=['script', 'style'])
+    content = converted.get(id(comment), content)
 
     lines = [f"{prefix} {author} (score: {score})", "", content, ""]
 
     for reply in comment.get("replies", []):
-        lines.append(format_comment(reply, indent_level + 1))
+        lines.append(format_comment(reply, converted, indent_level + 1))
 
     return "\n".join(lines)
 
@@ -78,8 +125,9 @@ def convert_post(post: dict) -> str:
             f"## Comments ({len(comments)} comments)",
             "",
         ])
+        converted = convert_comments_html(comments)
         for comment in comments:
-            lines.append(format_comment(comment))
+            lines.append(format_comment(comment, converted))
 
     return "\n".join(lines)
 
@@ -94,26 +142,25 @@ def main():
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    with open(input_path) as f:
-        papers = json.load(f)
-
     converted = 0
-    for paper in papers:
-        source = paper.get("source", "").lower()
-        if source not in ("lesswrong", "alignment_forum", "alignmentforum"):
-            continue
-
-        if not paper.get("html_content"):
-            continue
-
-        title = paper.get("title", "untitled")
-        paper_id = paper.get("id", slugify(title))
-        output_file = output_dir / f"{paper_id}.md"
-
-        markdown_content = convert_post(paper)
-        output_file.write_text(markdown_content)
-        converted += 1
-        print(f"Converted: {title[:50]}...")
+    with open(input_path, "rb") as f:
+        # Stream papers so conversion starts without parsing the whole file
+        for paper in ijson.items(f, "item", use_float=True):
+            source = paper.get("source")
+            if not source or source.lower() not in LW_SOURCES:
+                continue
+
+            if not paper.get("html_content"):
+                continue
+
+            title = paper.get("title", "untitled")
+            paper_id = paper.get("id", slugify(title))
+            output_file = output_dir / f"{paper_id}.md"
+
+            markdown_content = convert_post(paper)
+            output_file.write_bytes(markdown_content.encode("utf-8"))
+            converted += 1
+            print(f"Converted: {title[:50]}...")
 
     print(f"\nConverted {converted} LessWrong/AF posts to markdown")
 
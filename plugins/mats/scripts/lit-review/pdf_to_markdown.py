@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["pymupdf4llm", "pymupdf", "pillow"]
+# dependencies = ["pymupdf4llm", "pymupdf", "numpy"]
 # ///
 """
 Convert PDFs to markdown with ASCII art for figures.
@@ -10,26 +10,33 @@ Usage:
 """
 
 import argparse
-import io
+import os
+import sqlite3
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
 from pathlib import Path
 
 import fitz  # PyMuPDF
+import numpy as np
 import pymupdf4llm
-from PIL import Image
 
 ASCII_CHARS = "@%#*+=-:. "
+# Byte lookup table so a whole image maps to characters in one indexing step
+ASCII_LUT = np.frombuffer(ASCII_CHARS.encode("ascii"), dtype=np.uint8)
 
+# Pages handed to pymupdf4llm per call, bounding memory on very long documents
+PAGES_PER_CHUNK = 25
+
+# Records which PDF (by path, size and mtime) produced each markdown file
+CACHE_FILENAME = ".pdf_cache.sqlite"
 
-def image_to_ascii(img_bytes: bytes, width: int = 60) -> str:
-    """Convert image bytes to ASCII art approximation."""
-    try:
-        img = Image.open(io.BytesIO(img_bytes))
-        img = img.convert("L")  # Convert to grayscale
 
+def pixmap_to_ascii(pix: fitz.Pixmap, width: int = 60) -> str:
+    """Convert a decoded image to ASCII art approximation."""
+    try:
         # Calculate new dimensions maintaining aspect ratio
-        aspect_ratio = img.height / img.width
+        aspect_ratio = pix.height / pix.width
         new_height = int(width * aspect_ratio * 0.5)  # 0.5 for character aspect ratio
 
         if new_height < 1:
@@ -38,62 +45,58 @@ def image_to_ascii(img_bytes: bytes, width: int = 60) -> str:
             new_height = 50
             width = int(new_height / (aspect_ratio * 0.5))
 
-        img = img.resize((width, new_height))
+        # Downscale first so the grayscale conversion only touches output pixels
+        small = fitz.Pixmap(pix, width, new_height, None)
+        gray = fitz.Pixmap(fitz.csGRAY, small)
+
+        # Rows are padded to the stride; take the gray channel, skipping alpha
+        pixels = np.frombuffer(gray.samples, dtype=np.uint8).reshape(
+            gray.height, gray.stride
+        )[:, : gray.width * gray.n : gray.n]
 
         # Map pixels to ASCII characters
-        pixels = list(img.getdata())
-        ascii_lines = []
-        for i in range(0, len(pixels), width):
-            row = pixels[i : i + width]
-            line = "".join(
-                ASCII_CHARS[min(p * len(ASCII_CHARS) // 256, len(ASCII_CHARS) - 1)]
-                for p in row
-            )
-            ascii_lines.append(line)
-
-        return "\n".join(ascii_lines)
+        indices = np.minimum(
+            pixels.astype(np.uint16) * len(ASCII_CHARS) // 256, len(ASCII_CHARS) - 1
+        )
+        chars = ASCII_LUT[indices]
+
+        return "\n".join(row.tobytes().decode("ascii") for row in chars)
     except Exception as e:
         return f"[Image conversion failed: {e}]"
 
 
-def extract_figures_as_ascii(pdf_path: Path, ascii_width: int = 60) -> list[str]:
-    """Extract all figures from PDF and convert to ASCII art."""
+def extract_figures_as_ascii(doc: fitz.Document, ascii_width: int = 60) -> list[str]:
+    """Extract all figures from an open PDF and convert to ASCII art."""
     figures = []
 
     try:
-        doc = fitz.open(pdf_path)
-
         for page_num, page in enumerate(doc):
             images = page.get_images()
 
             for img_index, img in enumerate(images):
                 try:
                     xref = img[0]
-                    base_image = doc.extract_image(xref)
-
-                    if base_image and base_image.get("image"):
-                        ascii_art = image_to_ascii(
-                            base_image["image"], width=ascii_width
-                        )
-                        figures.append(
-                            {
-                                "page": page_num + 1,
-                                "index": img_index + 1,
-                                "ascii": ascii_art,
-                                "ext": base_image.get("ext", "unknown"),
-                            }
-                        )
+                    # Decode straight into a pixmap rather than extracting the
+                    # encoded image and decoding it again
+                    pix = fitz.Pixmap(doc, xref)
+                    ascii_art = pixmap_to_ascii(pix, width=ascii_width)
+                    pix = None  # Release the full-size samples
+
+                    figures.append(
+                        {
+                            "page": page_num + 1,
+                            "index": img_index + 1,
+                            "ascii": ascii_art,
+                        }
+                    )
                 except Exception as e:
                     figures.append(
                         {
                             "page": page_num + 1,
                             "index": img_index + 1,
                             "ascii": f"[Failed to extract: {e}]",
-                            "ext": "error",
                         }
                     )
-
-        doc.close()
     except Exception as e:
         print(f"  Error extracting figures: {e}", file=sys.stderr)
 
@@ -104,47 +107,69 @@ def convert_pdf_to_markdown(
     pdf_path: Path, output_path: Path, ascii_width: int = 60
 ) -> bool:
     """Convert a PDF to markdown with ASCII art figures."""
+    # Chunks are written as they are produced, so write to a temporary file
+    # that only replaces the output once the whole document has converted
+    partial_path = output_path.with_name(f"{output_path.name}.part")
+
     try:
-        # Get markdown text using pymupdf4llm
-        md_text = pymupdf4llm.to_markdown(
-            str(pdf_path),
-            write_images=False,
-            embed_images=False,
-        )
+        with fitz.open(pdf_path) as doc, partial_path.open("w", encoding="utf-8") as out:
+            # Get markdown text using pymupdf4llm, a page range at a time
+            for start in range(0, doc.page_count, PAGES_PER_CHUNK):
+                pages = list(range(start, min(start + PAGES_PER_CHUNK, doc.page_count)))
+                out.write(
+                    pymupdf4llm.to_markdown(
+                        doc,
+                        pages=pages,
+                        write_images=False,
+                        embed_images=False,
+                    )
+                )
 
-        # Extract and convert figures to ASCII
-        figures = extract_figures_as_ascii(pdf_path, ascii_width)
+            # Extract and convert figures to ASCII
+            figures = extract_figures_as_ascii(doc, ascii_width)
 
-        # Append figures section if any were extracted
-        if figures:
-            md_text += "\n\n---\n\n## Figures (ASCII Approximation)\n\n"
-            for fig in figures:
-                md_text += f"### Figure {fig['page']}.{fig['index']}\n\n"
-                md_text += f"```\n{fig['ascii']}\n```\n\n"
+            # Append figures section if any were extracted
+            if figures:
+                out.write("\n\n---\n\n## Figures (ASCII Approximation)\n\n")
+                for fig in figures:
+                    out.write(f"### Figure {fig['page']}.{fig['index']}\n\n")
+                    out.write(f"```\n{fig['ascii']}\n```\n\n")
 
-        # Write output
-        output_path.write_text(md_text, encoding="utf-8")
+        partial_path.replace(output_path)
         return True
 
     except Exception as e:
+        partial_path.unlink(missing_ok=True)
         print(f"  Error converting {pdf_path.name}: {e}", file=sys.stderr)
         return False
 
 
-def convert_single_pdf(args: tuple) -> tuple[Path, Path, bool, str]:
-    """Convert a single PDF. Returns (pdf_path, output_path, success, status)."""
+def convert_single_pdf(args: tuple) -> tuple[Path, Path, bool]:
+    """Convert a single PDF. Returns (pdf_path, output_path, success)."""
     pdf_path, output_path, ascii_width = args
+    success = convert_pdf_to_markdown(pdf_path, output_path, ascii_width)
+    return pdf_path, output_path, success
 
-    if output_path.exists():
-        return pdf_path, output_path, True, "skipped"
 
-    success = convert_pdf_to_markdown(pdf_path, output_path, ascii_width)
-    return pdf_path, output_path, success, "converted" if success else "failed"
+def open_conversion_cache(output_dir: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the conversion cache for an output directory."""
+    conn = sqlite3.connect(output_dir / CACHE_FILENAME)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS conversions ("
+        "realpath TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, md_path TEXT)"
+    )
+    return conn
 
 
-def convert_all(input_dir: Path, output_dir: Path, ascii_width: int = 60, max_workers: int = 8) -> dict:
-    """Convert all PDFs in directory to markdown using multiple threads."""
+def convert_all(
+    input_dir: Path,
+    output_dir: Path,
+    ascii_width: int = 60,
+    max_workers: int | None = None,
+) -> dict:
+    """Convert all PDFs in directory to markdown using multiple processes."""
     output_dir.mkdir(parents=True, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
 
     stats = {
         "total": 0,
@@ -162,35 +187,75 @@ def convert_all(input_dir: Path, output_dir: Path, ascii_width: int = 60, max_wo
         print("No PDFs found to convert.", file=sys.stderr)
         return stats
 
-    print(f"Converting {len(pdf_files)} PDFs to markdown ({max_workers} threads)...", file=sys.stderr)
-
-    # Prepare arguments for each conversion
-    conversion_args = [
-        (pdf_path, output_dir / f"{pdf_path.stem}.md", ascii_width)
-        for pdf_path in pdf_files
-    ]
-
-    # Process in parallel
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(convert_single_pdf, args): args[0]
-            for args in conversion_args
-        }
-
-        for future in as_completed(futures):
-            pdf_path, output_path, success, status = future.result()
+    # The connection's context manager commits all cache writes as one
+    # transaction at the end of the run
+    with closing(open_conversion_cache(output_dir)) as cache, cache:
+        # Skip PDFs whose markdown is up to date; only the rest go to the pool
+        conversion_args = []
+        pdf_stats = {}
+        for pdf_path in pdf_files:
+            output_path = output_dir / f"{pdf_path.stem}.md"
+            realpath = os.path.realpath(pdf_path)
+            # Resolved like the PDF path, so absolute and relative
+            # --output-dir runs share cache rows
+            md_path = os.path.realpath(output_path)
+            st = os.stat(realpath)
+            pdf_stats[pdf_path] = (realpath, st.st_size, st.st_mtime_ns, md_path)
+
+            row = cache.execute(
+                "SELECT size, mtime_ns, md_path FROM conversions WHERE realpath = ?",
+                (realpath,),
+            ).fetchone()
+            if row is None:
+                # Markdown from before the cache existed is trusted as is
+                up_to_date = output_path.exists()
+                if up_to_date:
+                    cache.execute(
+                        "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?)",
+                        pdf_stats[pdf_path],
+                    )
+            else:
+                up_to_date = (
+                    row == (st.st_size, st.st_mtime_ns, md_path)
+                    and output_path.exists()
+                )
 
-            if status == "skipped":
+            if up_to_date:
                 stats["skipped"] += 1
                 stats["converted_files"].append(str(output_path))
-            elif status == "converted":
-                stats["converted"] += 1
-                stats["converted_files"].append(str(output_path))
-                print(f"  ✓ {pdf_path.name}", file=sys.stderr)
             else:
-                stats["failed"] += 1
-                stats["failed_files"].append(str(pdf_path))
-                print(f"  ✗ {pdf_path.name}", file=sys.stderr)
+                conversion_args.append((pdf_path, output_path, ascii_width))
+
+        if not conversion_args:
+            return stats
+
+        print(
+            f"Converting {len(conversion_args)} PDFs to markdown ({max_workers} processes)...",
+            file=sys.stderr,
+        )
+
+        # Processes rather than threads: layout analysis and figure conversion
+        # are CPU-bound Python that would otherwise contend on the GIL
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(convert_single_pdf, args) for args in conversion_args
+            ]
+
+            for future in as_completed(futures):
+                pdf_path, output_path, success = future.result()
+
+                if success:
+                    stats["converted"] += 1
+                    stats["converted_files"].append(str(output_path))
+                    cache.execute(
+                        "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?)",
+                        pdf_stats[pdf_path],
+                    )
+                    print(f"  ✓ {pdf_path.name}", file=sys.stderr)
+                else:
+                    stats["failed"] += 1
+                    stats["failed_files"].append(str(pdf_path))
+                    print(f"  ✗ {pdf_path.name}", file=sys.stderr)
 
     return stats
 
@@ -217,8 +282,8 @@ def main():
     parser.add_argument(
         "--workers",
         type=int,
-        default=8,
-        help="Number of parallel workers (default: 8)",
+        default=None,
+        help="Number of parallel worker processes (default: CPU count)",
     )
     args = parser.parse_args()
 
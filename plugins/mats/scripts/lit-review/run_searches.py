@@ -10,14 +10,34 @@ aggregates their exit codes and outputs.
 """
 
 import argparse
+import os
+import signal
 import subprocess
 import sys
+import threading
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+SEARCH_TIMEOUT_SECONDS = 300
+STDERR_TAIL_LINES = 50  # Kept per search for the failure report
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    """Kill a search and everything it started."""
+    # `uv run` starts Python as a grandchild that holds the stderr pipe too,
+    # so killing uv alone would leave the read loop waiting on it
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # Already exited
+    else:  # Windows has no process groups to signal
+        proc.kill()
+
 
 def run_search(script_path: Path, queries_file: Path, output_file: Path, limit: int) -> tuple[str, int, str]:
-    """Run a single search script and return (name, exit_code, stderr)."""
+    """Run a single search script and return (name, exit_code, stderr tail)."""
     name = script_path.stem
     cmd = [
         "uv", "run", str(script_path),
@@ -26,13 +46,45 @@ def run_search(script_path: Path, queries_file: Path, output_file: Path, limit:
         "--limit", str(limit),
     ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        return name, result.returncode, result.stderr
-    except subprocess.TimeoutExpired:
-        return name, -1, "Timeout after 300 seconds"
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,  # Own process group, see kill_process_group
+        )
     except Exception as e:
         return name, -1, str(e)
 
+    timed_out = threading.Event()
+
+    def kill() -> None:
+        timed_out.set()
+        kill_process_group(proc)
+
+    # Killing the search closes its stderr, which ends the read loop below
+    timer = threading.Timer(SEARCH_TIMEOUT_SECONDS, kill)
+    timer.start()
+
+    # Forward progress as it happens, keeping only the tail in memory
+    tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+    try:
+        for line in proc.stderr:
+            sys.stderr.write(f"[{name}] {line}")
+            tail.append(line)
+        returncode = proc.wait()
+    except Exception as e:
+        kill_process_group(proc)
+        proc.wait()
+        return name, -1, str(e)
+    finally:
+        timer.cancel()
+        proc.stderr.close()
+
+    if timed_out.is_set():
+        return name, -1, f"Timeout after {SEARCH_TIMEOUT_SECONDS} seconds"
+    return name, returncode, "".join(tail)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Run all searches in parallel")
@@ -71,7 +123,9 @@ def main():
             else:
                 print(f"✗ {name} failed (exit code {exit_code})")
                 if stderr:
-                    print(f"  Error: {stderr[:200]}")
+                    print("  Error output (last lines):")
+                    for line in stderr.splitlines():
+                        print(f"    {line}")
 
     success_count = sum(1 for _, code, _ in results if code == 0)
     print(f"\nCompleted: {success_count}/{len(searches)} searches succeeded")
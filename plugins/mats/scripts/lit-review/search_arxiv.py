@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["arxiv>=2.1.0"]
+# dependencies = ["arxiv>=2.1.0", "orjson"]
 # ///
 """
 Search arXiv API for academic papers.
@@ -12,22 +12,33 @@ Usage:
 import argparse
 import json
 import sys
-import time
+from operator import attrgetter
 from pathlib import Path
 
 import arxiv
+import orjson
 
 DEFAULT_LIMIT_PER_QUERY = 100
 
-
-def search_query(query: str, limit: int = DEFAULT_LIMIT_PER_QUERY) -> list[dict]:
+# Fetches every field the output needs from an arxiv.Result in one call
+PAPER_FIELDS = attrgetter(
+    "entry_id",
+    "title",
+    "summary",
+    "authors",
+    "published",
+    "updated",
+    "pdf_url",
+    "doi",
+    "categories",
+    "primary_category",
+)
+
+
+def search_query(
+    client: arxiv.Client, query: str, limit: int = DEFAULT_LIMIT_PER_QUERY
+) -> list[dict]:
     """Search arXiv for a single query."""
-    client = arxiv.Client(
-        page_size=100,
-        delay_seconds=3.0,  # Respectful rate limiting
-        num_retries=5,
-    )
-
     search = arxiv.Search(
         query=query,
         max_results=limit,
@@ -37,23 +48,33 @@ def search_query(query: str, limit: int = DEFAULT_LIMIT_PER_QUERY) -> list[dict]
     results = []
     try:
         for paper in client.results(search):
+            (
+                entry_id,
+                title,
+                summary,
+                authors,
+                published,
+                updated,
+                pdf_url,
+                doi,
+                categories,
+                primary_category,
+            ) = PAPER_FIELDS(paper)
             results.append(
                 {
                     "source": "arxiv",
                     "search_query": query,
-                    "arxiv_id": paper.entry_id,
-                    "title": paper.title,
-                    "abstract": paper.summary,
-                    "authors": [a.name for a in paper.authors],
-                    "year": paper.published.year if paper.published else None,
-                    "published": (
-                        paper.published.isoformat() if paper.published else None
-                    ),
-                    "updated": paper.updated.isoformat() if paper.updated else None,
-                    "pdf_url": paper.pdf_url,
-                    "doi": paper.doi,
-                    "categories": paper.categories,
-                    "primary_category": paper.primary_category,
+                    "arxiv_id": entry_id,
+                    "title": title,
+                    "abstract": summary,
+                    "authors": [a.name for a in authors],
+                    "year": published.year if published else None,
+                    "published": published.isoformat() if published else None,
+                    "updated": updated.isoformat() if updated else None,
+                    "pdf_url": pdf_url,
+                    "doi": doi,
+                    "categories": categories,
+                    "primary_category": primary_category,
                 }
             )
     except Exception as e:
@@ -68,14 +89,19 @@ def search_all_queries(
     """Search all queries and combine results."""
     all_results = []
 
+    # One client for all queries, so its delay spaces out every request
+    # (pages and queries alike) without extra sleeps between queries
+    client = arxiv.Client(
+        page_size=100,
+        delay_seconds=3.0,  # Respectful rate limiting
+        num_retries=5,
+    )
+
     for i, query in enumerate(queries):
         print(f"Searching ({i+1}/{len(queries)}): {query}", file=sys.stderr)
-        results = search_query(query, limit_per_query)
+        results = search_query(client, query, limit_per_query)
         print(f"  Found {len(results)} results", file=sys.stderr)
         all_results.extend(results)
-        # Additional delay between queries
-        if i < len(queries) - 1:
-            time.sleep(1)
 
     return all_results
 
@@ -107,13 +133,18 @@ def main():
         print("Error: queries file must contain a JSON array of strings", file=sys.stderr)
         sys.exit(1)
 
+    # Drop blank and repeated queries, which would only re-fetch the same results
+    queries = list(
+        dict.fromkeys(q.strip() for q in queries if isinstance(q, str) and q.strip())
+    )
+
     # Run search
     results = search_all_queries(queries, args.limit)
 
     # Save results
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(results, f, indent=2)
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
     print(f"Saved {len(results)} results to {args.output}", file=sys.stderr)
 
@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = []
+# dependencies = ["httpx[http2]", "orjson", "xxhash"]
 # ///
 """
 Search for papers and posts using the Exa API (optional enhancement).
@@ -16,13 +16,28 @@ Usage:
 """
 
 import argparse
+import hashlib
 import json
 import os
+import re
+import sqlite3
 import sys
-import urllib.request
-import urllib.error
+import time
 from pathlib import Path
 
+import httpx
+import orjson
+import xxhash
+
+EXA_SEARCH_URL = "https://api.exa.ai/search"
+
+# EXA_API_KEY=... line in a .env file
+ENV_API_KEY_RE = re.compile(rb"^[ \t]*EXA_API_KEY[ \t]*=(.*)$", re.MULTILINE)
+
+# Responses are cached next to the output so re-runs skip repeated queries
+CACHE_FILENAME = ".exa_cache.sqlite"
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
 
 def load_api_key() -> str | None:
     """Load Exa API key from environment or .env file."""
@@ -39,23 +54,49 @@ def load_api_key() -> str | None:
 
     for env_path in env_paths:
         if env_path.exists():
-            with open(env_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith("EXA_API_KEY="):
-                        return line.split("=", 1)[1].strip().strip('"\'')
+            match = ENV_API_KEY_RE.search(env_path.read_bytes())
+            if match:
+                return match.group(1).decode().strip().strip('"\'')
 
     return None
 
 
-def exa_search(query: str, api_key: str, num_results: int = 10, domains: list[str] | None = None) -> dict:
-    """Search using Exa API."""
-    url = "https://api.exa.ai/search"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key,
-    }
+def open_response_cache(cache_path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the cache of Exa responses."""
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, ts INTEGER, body BLOB)"
+    )
+    return conn
+
+
+def response_cache_key(query: str, num_results: int, domains: list[str] | None) -> str:
+    """Hash the parameters that determine an Exa response."""
+    params = orjson.dumps([query, num_results, sorted(domains or [])])
+    return hashlib.blake2b(params).hexdigest()
+
+
+def get_cached_response(cache: sqlite3.Connection, key: str) -> dict | None:
+    """Return a cached response that is younger than the TTL."""
+    row = cache.execute("SELECT ts, body FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None or time.time() - row[0] > CACHE_TTL_SECONDS:
+        return None
+    return orjson.loads(row[1])
+
+
+def store_response(cache: sqlite3.Connection, key: str, response: dict) -> None:
+    """Cache a response, committing right away so interrupted runs keep it."""
+    with cache:
+        cache.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+            (key, int(time.time()), orjson.dumps(response)),
+        )
+
 
+def exa_search(
+    client: httpx.Client, query: str, num_results: int = 10, domains: list[str] | None = None
+) -> dict:
+    """Search using Exa API."""
     data = {
         "query": query,
         "numResults": num_results,
@@ -67,19 +108,13 @@ def exa_search(query: str, api_key: str, num_results: int = 10, domains: list[st
     if domains:
         data["includeDomains"] = domains
 
-    req = urllib.request.Request(
-        url,
-        data=json.dumps(data).encode("utf-8"),
-        headers=headers,
-        method="POST"
-    )
-
     try:
-        with urllib.request.urlopen(req, timeout=60) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        print(f"Exa API Error {e.code}: {error_body}", file=sys.stderr)
+        response = client.post(EXA_SEARCH_URL, content=orjson.dumps(data))
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    except httpx.HTTPStatusError as e:
+        error_body = e.response.text
+        print(f"Exa API Error {e.response.status_code}: {error_body}", file=sys.stderr)
         return {"results": [], "error": error_body}
     except Exception as e:
         print(f"Exa request failed: {e}", file=sys.stderr)
@@ -105,6 +140,11 @@ def main():
         action="store_true",
         help="Restrict to AI safety domains (LessWrong, arXiv, etc.)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Query Exa even when a cached response exists",
+    )
     args = parser.parse_args()
 
     # Load API key
@@ -137,36 +177,57 @@ def main():
             "80000hours.org",
         ]
 
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    cache = None
+    if not args.no_cache:
+        cache = open_response_cache(args.output.parent / CACHE_FILENAME)
+
     print(f"Searching with {len(queries)} queries using Exa...", file=sys.stderr)
 
     all_results = []
-    seen_urls = set()
+    # 64-bit URL hashes: much smaller than keeping every full URL string
+    seen_urls: set[int] = set()
 
-    for i, query in enumerate(queries):
-        print(f"  ({i+1}/{len(queries)}) {query[:50]}...", file=sys.stderr)
-
-        response = exa_search(query, api_key, args.limit, domains)
-
-        for result in response.get("results", []):
-            url = result.get("url", "")
-            if url in seen_urls:
-                continue
-            seen_urls.add(url)
-
-            all_results.append({
-                "url": url,
-                "title": result.get("title", ""),
-                "text": result.get("text", ""),
-                "published_date": result.get("publishedDate"),
-                "author": result.get("author"),
-                "search_query": query,
-                "source": "exa",
-            })
+    # One client for every query, so the connection and TLS session are reused
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key,
+    }
+    with httpx.Client(http2=True, headers=headers, timeout=60.0) as client:
+        for i, query in enumerate(queries):
+            print(f"  ({i+1}/{len(queries)}) {query[:50]}...", file=sys.stderr)
+
+            key = response_cache_key(query, args.limit, domains)
+            response = get_cached_response(cache, key) if cache is not None else None
+            if response is None:
+                response = exa_search(client, query, args.limit, domains)
+                # Failed requests are retried next run rather than cached
+                if cache is not None and "error" not in response:
+                    store_response(cache, key, response)
+
+            for result in response.get("results", []):
+                url = result.get("url", "")
+                url_hash = xxhash.xxh64_intdigest((url or "").encode())
+                if url_hash in seen_urls:
+                    continue
+                seen_urls.add(url_hash)
+
+                all_results.append({
+                    "url": url,
+                    "title": result.get("title", ""),
+                    "text": result.get("text", ""),
+                    "published_date": result.get("publishedDate"),
+                    "author": result.get("author"),
+                    "search_query": query,
+                    "source": "exa",
+                })
+
+    if cache is not None:
+        cache.close()
 
     # Save results
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(all_results, f, indent=2)
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(all_results, option=orjson.OPT_INDENT_2))
 
     print(f"\nFound {len(all_results)} unique results", file=sys.stderr)
     print(f"Saved to {args.output}", file=sys.stderr)
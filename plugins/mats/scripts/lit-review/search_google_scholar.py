@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["httpx", "beautifulsoup4"]
+# dependencies = ["httpx", "orjson", "selectolax"]
 # ///
 """
 Search Google Scholar via web scraping.
@@ -12,17 +12,28 @@ Usage:
 
 import argparse
 import asyncio
+import hashlib
 import json
+import math
 import random
 import re
 import sys
+import time
 from pathlib import Path
 
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+from selectolax.lexbor import LexborHTMLParser
 
 GOOGLE_SCHOLAR_URL = "https://scholar.google.com/scholar"
 DEFAULT_LIMIT_PER_QUERY = 50
+# 429 backoff; Scholar blocks aggressive clients, so start long
+RETRY_BASE_SECONDS = 60
+RETRY_CAP_SECONDS = 240
+# Saved per-query results are reused for as long as search_exa caches responses
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+CITED_BY_RE = re.compile(r"Cited by (\d+)")
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -34,16 +45,39 @@ USER_AGENTS = [
 
 def parse_citation_count(citation_text: str) -> int | None:
     """Extract citation count from 'Cited by N' text."""
-    match = re.search(r"Cited by (\d+)", citation_text)
+    match = CITED_BY_RE.search(citation_text)
     if match:
         return int(match.group(1))
     return None
 
 
+def retry_delay(resp: httpx.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After if usable, else equal-jitter backoff."""
+    try:
+        retry_after = float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        retry_after = math.nan
+
+    # inf would sleep forever and nan or negative values would skip the wait;
+    # a sane header is still capped so one query can't stall for hours
+    if math.isfinite(retry_after) and retry_after >= 0:
+        return min(retry_after, RETRY_CAP_SECONDS)
+
+    # Jitter only the upper half: Scholar CAPTCHAs clients that come back
+    # too fast, so never wait less than half the backoff
+    delay = min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
 async def search_query(
     client: httpx.AsyncClient, query: str, limit: int = DEFAULT_LIMIT_PER_QUERY
-) -> list[dict]:
-    """Search Google Scholar for a single query."""
+) -> tuple[list[dict], bool]:
+    """
+    Search Google Scholar for a single query.
+
+    Returns (results, complete); complete is False if a block or errors cut
+    the search short.
+    """
     results = []
     start = 0
 
@@ -72,9 +106,9 @@ async def search_query(
                 )
 
                 if resp.status_code == 429:
-                    wait_time = 60 * (attempt + 1)
+                    wait_time = retry_delay(resp, attempt)
                     print(
-                        f"  Rate limited (429), waiting {wait_time}s...",
+                        f"  Rate limited (429), waiting {wait_time:.1f}s...",
                         file=sys.stderr,
                     )
                     await asyncio.sleep(wait_time)
@@ -85,54 +119,60 @@ async def search_query(
                         "  Google Scholar returned 503 (possibly CAPTCHA). Stopping.",
                         file=sys.stderr,
                     )
-                    return results
+                    return results, False
 
                 resp.raise_for_status()
 
-                soup = BeautifulSoup(resp.text, "html.parser")
+                # Lexbor (C) parses and runs the selectors far faster than
+                # BeautifulSoup
+                tree = LexborHTMLParser(resp.text)
 
                 # Check for CAPTCHA
-                if soup.find("form", {"id": "gs_captcha_f"}):
+                if tree.css_first("form#gs_captcha_f"):
                     print(
                         "  CAPTCHA detected. Google Scholar scraping blocked.",
                         file=sys.stderr,
                     )
-                    return results
+                    return results, False
 
-                articles = soup.select(".gs_ri")
+                articles = tree.css(".gs_ri")
 
                 if not articles:
-                    # No more results
-                    return results
+                    # No more results. An empty first page is more likely an
+                    # unrecognized block page than a query with no hits, so
+                    # it is not treated as a finished search
+                    return results, start > 0
 
                 for article in articles:
-                    title_elem = article.select_one(".gs_rt a")
+                    title_elem = article.css_first(".gs_rt a")
                     if not title_elem:
                         # Skip entries without title links (citations, etc.)
                         continue
 
                     # Extract metadata
-                    title = title_elem.get_text(strip=True)
-                    url = title_elem.get("href", "")
+                    title = title_elem.text(strip=True)
+                    url = title_elem.attributes.get("href") or ""
 
                     # Author/publication info
-                    meta_elem = article.select_one(".gs_a")
-                    meta_text = meta_elem.get_text(strip=True) if meta_elem else ""
+                    meta_elem = article.css_first(".gs_a")
+                    meta_text = meta_elem.text(strip=True) if meta_elem else ""
 
                     # Snippet/abstract
-                    snippet_elem = article.select_one(".gs_rs")
+                    snippet_elem = article.css_first(".gs_rs")
                     snippet = (
-                        snippet_elem.get_text(strip=True) if snippet_elem else ""
+                        snippet_elem.text(strip=True) if snippet_elem else ""
                     )
 
-                    # Citation info
-                    footer_elem = article.select_one(".gs_fl")
-                    footer_text = footer_elem.get_text() if footer_elem else ""
-                    citation_count = parse_citation_count(footer_text)
+                    # Citation info, from just the "Cited by N" link rather
+                    # than the text of the whole footer
+                    cited_elem = article.css_first('.gs_fl a:lexbor-contains("Cited by")')
+                    citation_count = (
+                        parse_citation_count(cited_elem.text()) if cited_elem else None
+                    )
 
                     # PDF link if available
-                    pdf_elem = article.select_one(".gs_or_ggsm a")
-                    pdf_url = pdf_elem.get("href") if pdf_elem else None
+                    pdf_elem = article.css_first(".gs_or_ggsm a")
+                    pdf_url = pdf_elem.attributes.get("href") if pdf_elem else None
 
                     results.append(
                         {
@@ -156,35 +196,80 @@ async def search_query(
                         f"  HTTP error after 3 attempts: {e}",
                         file=sys.stderr,
                     )
-                    return results
+                    return results, False
                 await asyncio.sleep(10 * (attempt + 1))
             except Exception as e:
                 if attempt == 2:
                     print(f"  Error: {e}", file=sys.stderr)
-                    return results
+                    return results, False
                 await asyncio.sleep(5 * (attempt + 1))
 
-    return results
+    return results, True
+
+
+def checkpoint_path(checkpoint_dir: Path, query: str, limit: int) -> Path:
+    """Sidecar file holding the finished results of one query."""
+    digest = hashlib.sha1(orjson.dumps([query, limit])).hexdigest()
+    return checkpoint_dir / f"{digest}.json"
+
+
+def load_checkpoint(checkpoint: Path) -> list[dict] | None:
+    """Return a query's saved results if they are younger than the TTL."""
+    try:
+        if time.time() - checkpoint.stat().st_mtime > CHECKPOINT_TTL_SECONDS:
+            return None
+        return orjson.loads(checkpoint.read_bytes())
+    except FileNotFoundError:
+        return None
 
 
 async def search_all_queries(
-    queries: list[str], limit_per_query: int = DEFAULT_LIMIT_PER_QUERY
+    queries: list[str],
+    limit_per_query: int = DEFAULT_LIMIT_PER_QUERY,
+    checkpoint_dir: Path | None = None,
 ) -> list[dict]:
-    """Search all queries and combine results."""
+    """
+    Search all queries and combine results.
+
+    With a checkpoint_dir, each completed query's results are saved there and
+    queries saved by a run within the last week are not searched again.
+    """
     all_results = []
+    searched = False
 
     async with httpx.AsyncClient() as client:
         for i, query in enumerate(queries):
-            print(f"Searching ({i+1}/{len(queries)}): {query}", file=sys.stderr)
-            results = await search_query(client, query, limit_per_query)
-            print(f"  Found {len(results)} results", file=sys.stderr)
-            all_results.extend(results)
+            checkpoint = None
+            if checkpoint_dir:
+                checkpoint = checkpoint_path(checkpoint_dir, query, limit_per_query)
+                results = load_checkpoint(checkpoint)
+                if results is not None:
+                    print(
+                        f"Loaded {len(results)} saved results for: {query}",
+                        file=sys.stderr,
+                    )
+                    all_results.extend(results)
+                    continue
 
             # Longer delay between queries
-            if i < len(queries) - 1:
+            if searched:
                 delay = random.uniform(10, 20)
                 print(f"  Waiting {delay:.1f}s before next query...", file=sys.stderr)
                 await asyncio.sleep(delay)
+            searched = True
+
+            print(f"Searching ({i+1}/{len(queries)}): {query}", file=sys.stderr)
+            results, complete = await search_query(client, query, limit_per_query)
+            print(f"  Found {len(results)} results", file=sys.stderr)
+            all_results.extend(results)
+
+            # Only finished searches are saved, so a query cut short by a block
+            # is retried next run; the rename keeps a killed run from leaving
+            # half a file
+            if checkpoint and complete:
+                partial = checkpoint.with_suffix(".part")
+                partial.write_bytes(orjson.dumps(results))
+                partial.replace(checkpoint)
 
     return all_results
 
@@ -208,6 +293,11 @@ def main():
         default=DEFAULT_LIMIT_PER_QUERY,
         help="Max results per query",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Search every query again instead of reusing results saved by earlier runs",
+    )
     args = parser.parse_args()
 
     # Load queries
@@ -218,6 +308,11 @@ def main():
         print("Error: queries file must contain a JSON array of strings", file=sys.stderr)
         sys.exit(1)
 
+    # Drop blank and repeated queries, which would only re-fetch the same results
+    queries = list(
+        dict.fromkeys(q.strip() for q in queries if isinstance(q, str) and q.strip())
+    )
+
     print(
         "WARNING: Google Scholar scraping is fragile and may be blocked.",
         file=sys.stderr,
@@ -225,13 +320,19 @@ def main():
     print("This source is 'best effort' - results may be incomplete.", file=sys.stderr)
     print("", file=sys.stderr)
 
+    # Per-query results are kept next to the output so a restarted run resumes
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint_dir = None
+    if not args.no_cache:
+        checkpoint_dir = args.output.parent / f".{args.output.stem}.cache"
+        checkpoint_dir.mkdir(exist_ok=True)
+
     # Run search
-    results = asyncio.run(search_all_queries(queries, args.limit))
+    results = asyncio.run(search_all_queries(queries, args.limit, checkpoint_dir))
 
     # Save results
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(results, f, indent=2)
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
     print(f"Saved {len(results)} results to {args.output}", file=sys.stderr)
 
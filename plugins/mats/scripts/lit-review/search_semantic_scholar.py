@@ -1,6 +1,6 @@
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["httpx"]
+# dependencies = ["httpx[http2]", "aiolimiter", "orjson"]
 # ///
 """
 Search Semantic Scholar API for academic papers.
@@ -11,57 +11,111 @@ Usage:
 
 import argparse
 import asyncio
+import hashlib
 import json
+import math
+import random
 import sys
+import time
 from pathlib import Path
 
 import httpx
+import orjson
+from aiolimiter import AsyncLimiter
 
 SEMANTIC_SCHOLAR_API = "https://api.semanticscholar.org/graph/v1/paper/search"
 FIELDS = "paperId,externalIds,title,abstract,authors,year,citationCount,openAccessPdf,url"
 DEFAULT_LIMIT_PER_QUERY = 100
+MAX_CONCURRENT_QUERIES = 5
+REQUESTS_PER_SECOND = 1  # Unauthenticated API limit
+# 429 backoff
+RETRY_BASE_SECONDS = 1
+RETRY_CAP_SECONDS = 60
+# Saved per-query results are reused for as long as search_exa caches responses
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Part of each checkpoint's key; bump whenever paper_record's output changes so
+# records in an older shape are never mixed into a new output file
+CHECKPOINT_SCHEMA_VERSION = 2
+
+
+def paper_record(paper: dict, query: str) -> dict:
+    """Build the output record for an API paper, keeping only fields used downstream."""
+    # Extract DOI and arXiv ID from externalIds
+    external_ids = paper.get("externalIds") or {}
+    return {
+        "source": "semantic_scholar",
+        "search_query": query,
+        "paperId": paper.get("paperId"),
+        "title": paper.get("title"),
+        "abstract": paper.get("abstract"),
+        "authors": [a["name"] for a in paper.get("authors") or [] if a.get("name")],
+        "year": paper.get("year"),
+        "citationCount": paper.get("citationCount"),
+        "openAccessPdf": paper.get("openAccessPdf"),
+        "url": paper.get("url"),
+        "doi": external_ids.get("DOI"),
+        "arxiv_id": external_ids.get("ArXiv"),
+    }
+
+
+def retry_delay(resp: httpx.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After if usable, else full-jitter backoff."""
+    try:
+        retry_after = float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        retry_after = math.nan
+
+    # inf would sleep forever and nan or negative values would skip the wait;
+    # a sane header is still capped so one query can't stall for hours
+    if math.isfinite(retry_after) and retry_after >= 0:
+        return min(retry_after, RETRY_CAP_SECONDS)
+
+    # Random waits keep concurrent clients from retrying in lockstep
+    return random.uniform(0, min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * 2**attempt))
 
 
 async def search_query(
-    client: httpx.AsyncClient, query: str, limit: int = DEFAULT_LIMIT_PER_QUERY
-) -> list[dict]:
-    """Search Semantic Scholar for a single query with retry logic."""
+    client: httpx.AsyncClient,
+    limiter: AsyncLimiter,
+    query: str,
+    limit: int = DEFAULT_LIMIT_PER_QUERY,
+) -> tuple[list[dict], bool]:
+    """
+    Search Semantic Scholar for a single query with retry logic.
+
+    Returns (results, complete); complete is False if errors cut the search short.
+    """
     results = []
     offset = 0
 
     while len(results) < limit:
         for attempt in range(5):
             try:
-                resp = await client.get(
-                    SEMANTIC_SCHOLAR_API,
-                    params={
-                        "query": query,
-                        "fields": FIELDS,
-                        "offset": offset,
-                        "limit": min(100, limit - len(results)),
-                    },
-                    timeout=30.0,
-                )
+                async with limiter:
+                    resp = await client.get(
+                        SEMANTIC_SCHOLAR_API,
+                        params={
+                            "query": query,
+                            "fields": FIELDS,
+                            "offset": offset,
+                            "limit": min(100, limit - len(results)),
+                        },
+                        timeout=30.0,
+                    )
                 if resp.status_code == 429:
-                    wait_time = 2**attempt
-                    print(f"  Rate limited, waiting {wait_time}s...", file=sys.stderr)
+                    wait_time = retry_delay(resp, attempt)
+                    print(f"  Rate limited, waiting {wait_time:.1f}s...", file=sys.stderr)
                     await asyncio.sleep(wait_time)
                     continue
                 resp.raise_for_status()
-                data = resp.json()
-
-                batch = data.get("data", [])
-                for paper in batch:
-                    paper["source"] = "semantic_scholar"
-                    paper["search_query"] = query
-                    # Extract DOI from externalIds
-                    if paper.get("externalIds"):
-                        paper["doi"] = paper["externalIds"].get("DOI")
-                        paper["arxiv_id"] = paper["externalIds"].get("ArXiv")
-                results.extend(batch)
+                data = orjson.loads(resp.content)
+
+                results.extend(
+                    paper_record(paper, query) for paper in data.get("data", [])
+                )
 
                 if not data.get("next"):
-                    return results
+                    return results, True
                 offset = data["next"]
                 break
             except httpx.HTTPStatusError as e:
@@ -70,34 +124,91 @@ async def search_query(
                         f"  Failed after 5 attempts: {e}",
                         file=sys.stderr,
                     )
-                    return results
+                    return results, False
                 await asyncio.sleep(2**attempt)
             except Exception as e:
                 if attempt == 4:
                     print(f"  Error: {e}", file=sys.stderr)
-                    return results
+                    return results, False
                 await asyncio.sleep(2**attempt)
 
-    return results
+    return results, True
+
+
+def checkpoint_path(checkpoint_dir: Path, query: str, limit: int) -> Path:
+    """Sidecar file holding the finished results of one query."""
+    digest = hashlib.sha1(
+        orjson.dumps([CHECKPOINT_SCHEMA_VERSION, query, limit])
+    ).hexdigest()
+    return checkpoint_dir / f"{digest}.json"
+
+
+def load_checkpoint(checkpoint: Path) -> list[dict] | None:
+    """Return a query's saved results if they are younger than the TTL."""
+    try:
+        if time.time() - checkpoint.stat().st_mtime > CHECKPOINT_TTL_SECONDS:
+            return None
+        return orjson.loads(checkpoint.read_bytes())
+    except FileNotFoundError:
+        return None
 
 
 async def search_all_queries(
-    queries: list[str], limit_per_query: int = DEFAULT_LIMIT_PER_QUERY
+    queries: list[str],
+    limit_per_query: int = DEFAULT_LIMIT_PER_QUERY,
+    checkpoint_dir: Path | None = None,
 ) -> list[dict]:
-    """Search all queries and combine results."""
-    all_results = []
+    """
+    Search all queries concurrently and combine results in query order.
+
+    With a checkpoint_dir, each completed query's results are saved there and
+    queries saved by a run within the last week are not searched again.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    # Token bucket shared by every query, so requests stay under the API's
+    # per-second limit without idle gaps between queries
+    limiter = AsyncLimiter(REQUESTS_PER_SECOND, 1)
+
+    async def search_one(client: httpx.AsyncClient, i: int, query: str) -> list[dict]:
+        checkpoint = None
+        if checkpoint_dir:
+            checkpoint = checkpoint_path(checkpoint_dir, query, limit_per_query)
+            results = load_checkpoint(checkpoint)
+            if results is not None:
+                print(
+                    f"Loaded {len(results)} saved results for: {query}",
+                    file=sys.stderr,
+                )
+                return results
 
-    async with httpx.AsyncClient() as client:
-        for i, query in enumerate(queries):
+        async with semaphore:
             print(f"Searching ({i+1}/{len(queries)}): {query}", file=sys.stderr)
-            results = await search_query(client, query, limit_per_query)
-            print(f"  Found {len(results)} results", file=sys.stderr)
-            all_results.extend(results)
-            # Small delay between queries to be respectful
-            if i < len(queries) - 1:
-                await asyncio.sleep(1)
+            results, complete = await search_query(
+                client, limiter, query, limit_per_query
+            )
+            print(f"  Found {len(results)} results for: {query}", file=sys.stderr)
+
+        # Only finished searches are saved, so a query cut short by errors is
+        # retried next run; the rename keeps a killed run from leaving half a file
+        if checkpoint and complete:
+            partial = checkpoint.with_suffix(".part")
+            partial.write_bytes(orjson.dumps(results))
+            partial.replace(checkpoint)
+        return results
+
+    # Every request goes to one host, so keep connections alive between
+    # queries and let HTTP/2 multiplex them
+    limits = httpx.Limits(
+        max_keepalive_connections=20,
+        max_connections=100,
+        keepalive_expiry=30,
+    )
+    async with httpx.AsyncClient(http2=True, limits=limits) as client:
+        per_query = await asyncio.gather(
+            *(search_one(client, i, query) for i, query in enumerate(queries))
+        )
 
-    return all_results
+    return [paper for results in per_query for paper in results]
 
 
 def main():
@@ -117,6 +228,11 @@ def main():
         default=DEFAULT_LIMIT_PER_QUERY,
         help="Max results per query",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Search every query again instead of reusing results saved by earlier runs",
+    )
     args = parser.parse_args()
 
     # Load queries
@@ -127,13 +243,24 @@ def main():
         print("Error: queries file must contain a JSON array of strings", file=sys.stderr)
         sys.exit(1)
 
+    # Drop blank and repeated queries, which would only re-fetch the same results
+    queries = list(
+        dict.fromkeys(q.strip() for q in queries if isinstance(q, str) and q.strip())
+    )
+
+    # Per-query results are kept next to the output so a restarted run resumes
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint_dir = None
+    if not args.no_cache:
+        checkpoint_dir = args.output.parent / f".{args.output.stem}.cache"
+        checkpoint_dir.mkdir(exist_ok=True)
+
     # Run search
-    results = asyncio.run(search_all_queries(queries, args.limit))
+    results = asyncio.run(search_all_queries(queries, args.limit, checkpoint_dir))
 
     # Save results
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    with open(args.output, "w") as f:
-        json.dump(results, f, indent=2)
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
     print(f"Saved {len(results)} results to {args.output}", file=sys.stderr)
 